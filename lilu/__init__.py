@@ -1,5 +1,6 @@
 from lilu.api import TikTokAPI
 from lilu.reporting import TikTokReporter
+from lilu.planning import TikTokReportPlanner, ReportPlan
 from lilu.error import TikTokAPIError, TikTokUsageError, TikTokMissingAdvertiserError
 from lilu.run import run
 from . import context
\ No newline at end of file
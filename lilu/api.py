@@ -1,13 +1,15 @@
 import json
+import time
 import requests
+import threading
 
-from .context import EntityGranularity
-from .error import TikTokAPIError, TikTokPaginationError
+from .context import EntityGranularity, advertiser_info_fields
+from .error import TikTokAPIError, TikTokPaginationError, TikTokUsageError
 from typing import Optional, Dict, List, Callable
 from furl import furl
 
 def handle_response_error_and_page(f: Callable[..., Dict[str, any]]) -> Callable[..., Dict[str, any]]:
-  def wrapper(*args, params: Dict[str, any], **kwargs):
+  def wrapper(*args, params: Dict[str, any], paginate: bool=True, **kwargs):
     response = f(
       *args,
       params=params,
@@ -15,6 +17,8 @@ def handle_response_error_and_page(f: Callable[..., Dict[str, any]]) -> Callable
     )
     if response['code'] != 0:
       raise TikTokAPIError(response=response)
+    if not paginate:
+      return response
     page_info = response['page_info'] if 'page_info' in response else response['data']['page_info'] if 'data' in response and 'page_info' in response['data'] else None
     if page_info is not None and page_info['page'] < page_info['total_page']:
       if 'data' not in response or 'list' not in response['data']:
@@ -37,17 +41,39 @@ def handle_response_error_and_page(f: Callable[..., Dict[str, any]]) -> Callable
     return response
   return wrapper
 
+class RateBudget:
+  requests_per_second: float
+  _lock: threading.Lock
+  _next_time: float
+
+  def __init__(self, requests_per_second: float):
+    self.requests_per_second = requests_per_second
+    self._lock = threading.Lock()
+    self._next_time = 0.0
+
+  def acquire(self, count: int=1):
+    with self._lock:
+      now = time.monotonic()
+      start_time = max(now, self._next_time)
+      self._next_time = start_time + count / self.requests_per_second
+    if start_time > now:
+      time.sleep(start_time - now)
+
 class TikTokAPI:
   access_token: str
   client_secret: str
   app_id: str
   advertiser_id: Optional[str]
+  session: Optional[requests.Session]
+  rate_budget: Optional[RateBudget]
 
-  def __init__(self, access_token: str, client_secret: str, app_id: str, advertiser_id: Optional[str]=None):
+  def __init__(self, access_token: str, client_secret: str, app_id: str, advertiser_id: Optional[str]=None, session: Optional[requests.Session]=None, rate_budget: Optional[RateBudget]=None):
     self.access_token = access_token
     self.client_secret = client_secret
     self.app_id = app_id
     self.advertiser_id = advertiser_id
+    self.session = session
+    self.rate_budget = rate_budget
   
   @property
   def api_base_url(self) -> str:
@@ -58,10 +84,12 @@ class TikTokAPI:
     url = f'{self.api_base_url}/{endpoint}'
     headers = {'Access-Token': self.access_token}
     query_params = {
-      k: json.dumps(v) if isinstance(v, list) or isinstance(v, dict) else v
+      k: json.dumps(v, default=str) if isinstance(v, list) or isinstance(v, dict) else v
       for k, v in params.items()
     }
-    response = requests.get(url, params=query_params, headers=headers)
+    if self.rate_budget is not None:
+      self.rate_budget.acquire()
+    response = (self.session if self.session is not None else requests).get(url, params=query_params, headers=headers)
     return response.json()
   
   def get_advertiser_list(self):
@@ -78,6 +106,10 @@ class TikTokAPI:
     assert advertiser_ids is not None or self.advertiser_id is not None
     if advertiser_ids is None:
       advertiser_ids = [self.advertiser_id]
+    if fields is not None:
+      unknown_fields = [f for f in fields if f not in advertiser_info_fields]
+      if unknown_fields:
+        raise TikTokUsageError(f'TikTok Usage Error: Unknown advertiser info fields {unknown_fields}')
 
     response = self.get(
       endpoint='2/advertiser/info/',
@@ -88,10 +120,14 @@ class TikTokAPI:
     )
     return response['data']
   
-  def get_entities(self, granularity: str, ids: Optional[List[str]]=None, advertiser_id: Optional[str]=None, deleted_only: bool=False) -> List[Dict[str, any]]:
+  def get_entities(self, granularity: str, ids: Optional[List[str]]=None, advertiser_id: Optional[str]=None, deleted_only: bool=False, fields: Optional[List[str]]=None) -> List[Dict[str, any]]:
     granularity = EntityGranularity(granularity)
     if ids is not None and len(ids) == 0:
       return []
+    if fields is not None:
+      unknown_fields = [f for f in fields if f not in granularity.api_entity_fields]
+      if unknown_fields:
+        raise TikTokUsageError(f'TikTok Usage Error: Unknown {granularity.value} fields {unknown_fields}')
 
     advertiser_id = advertiser_id if advertiser_id is not None else self.advertiser_id
     assert advertiser_id is not None
@@ -100,6 +136,7 @@ class TikTokAPI:
       params={
         'advertiser_id': self.advertiser_id,
         'page_size': 1000,
+        **({'fields': fields} if fields is not None else {}),
         'filtering': {
           **({f'{granularity.value}_ids': ids} if ids is not None else {}),
           **({'primary_status': 'STATUS_DELETE'} if deleted_only else {}),
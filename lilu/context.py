@@ -1,6 +1,13 @@
 from enum import Enum
 from typing import Optional, List, Dict
 
+entity_id_fields = [
+  'advertiser_id',
+  'campaign_id',
+  'adgroup_id',
+  'ad_id',
+]
+
 class TimeGranularity(Enum):
   hourly = 'hourly'
   daily = 'daily'
@@ -40,6 +47,26 @@ class EntityGranularity(Enum):
         return performance_column
     return None
 
+  def entity_to_api_column(self, entity_column: str) -> Optional[str]:
+    if entity_column not in self.entity_columns:
+      return None
+    return entity_column.split(self.prefix, maxsplit=1)[1]
+
+  @property
+  def api_entity_fields(self) -> List[str]:
+    return [self.entity_to_api_column(c) for c in self.entity_columns]
+
+  @property
+  def api_id_field(self) -> str:
+    return f'{self.prefix}id'
+
+  @property
+  def id_column(self) -> str:
+    return f'{self.prefix}{self.api_id_field}'
+
+  def is_id_column(self, column: str) -> bool:
+    return column.startswith(self.prefix) and column[len(self.prefix):] in entity_id_fields
+
   @property
   def entity_columns(self) -> List[str]:
     if self is EntityGranularity.campaign:
@@ -293,4 +320,41 @@ class EntityGranularity(Enum):
         'ad_click_cnt',
         'ad_dy_home_visited',
         'ad_active_show_cost',
-      ]
\ No newline at end of file
+      ]
+
+advertiser_info_fields = [
+  'id',
+  'name',
+  'address',
+  'status',
+  'role',
+  'reason',
+  'license_url',
+  'license_no',
+  'license_province',
+  'license_city',
+  'company',
+  'contacter',
+  'email',
+  'telephone',
+  'industry',
+  'currency',
+  'timezone',
+  'balance',
+  'create_time',
+  'description',
+  'promotion_area',
+  'promotion_center_province',
+  'promotion_center_city',
+  'brand',
+  'language',
+  'phone_number',
+  'country',
+  'display_timezone',
+]
+
+advertiser_info_dtypes = {
+  'id': 'int64',
+  'balance': 'float64',
+  'create_time': 'datetime64[ns]',
+}
@@ -0,0 +1,191 @@
+import math
+
+from .api import TikTokAPI, RateBudget
+from .error import TikTokUsageError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+
+class PlannedRequest:
+  endpoint: str
+  params: Dict[str, any]
+  start: datetime
+  end: datetime
+  entity_ids: Optional[List[str]]
+  estimated_rows: int
+
+  def __init__(self, endpoint: str, params: Dict[str, any], start: datetime, end: datetime, entity_ids: Optional[List[str]], estimated_rows: int):
+    self.endpoint = endpoint
+    self.params = params
+    self.start = start
+    self.end = end
+    self.entity_ids = entity_ids
+    self.estimated_rows = estimated_rows
+
+  @property
+  def page_size(self) -> int:
+    return self.params['page_size']
+
+  @property
+  def estimated_pages(self) -> int:
+    return max(1, math.ceil(self.estimated_rows / self.page_size))
+
+class ReportPlan:
+  requests: List[PlannedRequest]
+  probe_count: int
+  parallelism: int
+  requests_per_second: float
+  seconds_per_page: float
+  report_arguments: Optional[Dict[str, any]]
+
+  def __init__(self, requests: List[PlannedRequest], probe_count: int, parallelism: int, requests_per_second: float, seconds_per_page: float, report_arguments: Optional[Dict[str, any]]=None):
+    self.requests = requests
+    self.probe_count = probe_count
+    self.parallelism = parallelism
+    self.requests_per_second = requests_per_second
+    self.seconds_per_page = seconds_per_page
+    self.report_arguments = report_arguments
+
+  @property
+  def estimated_rows(self) -> int:
+    return sum(r.estimated_rows for r in self.requests)
+
+  @property
+  def estimated_pages(self) -> int:
+    return sum(r.estimated_pages for r in self.requests)
+
+  @property
+  def estimated_seconds(self) -> float:
+    if not self.requests:
+      return 0.0
+    budget_seconds = self.estimated_pages / self.requests_per_second
+    concurrency_seconds = self.estimated_pages * self.seconds_per_page / self.parallelism
+    return max(budget_seconds, concurrency_seconds)
+
+  def explain(self) -> str:
+    lines = [
+      f'{len(self.requests)} requests ({self.probe_count} probes already made), parallelism {self.parallelism} at {self.requests_per_second:g} requests/s',
+      f'estimated {self.estimated_rows} rows in {self.estimated_pages} pages, {timedelta(seconds=round(self.estimated_seconds))}',
+    ]
+    for index, request in enumerate(self.requests):
+      ids_description = f'{len(request.entity_ids)} ids' if request.entity_ids is not None else 'all ids'
+      lines.append(f'  [{index}] {request.endpoint} {request.start:%Y-%m-%d}..{request.end:%Y-%m-%d} {ids_description}: ~{request.estimated_rows} rows, {request.estimated_pages} pages of {request.page_size}')
+    return '\n'.join(lines)
+
+  def execute(self, api: TikTokAPI) -> List[Dict[str, any]]:
+    if not self.requests:
+      return []
+    budget = RateBudget(requests_per_second=self.requests_per_second) if api.rate_budget is None else None
+    def run_request(request: PlannedRequest) -> List[Dict[str, any]]:
+      if budget is not None:
+        budget.acquire(count=request.estimated_pages)
+      response = api.get(endpoint=request.endpoint, params=request.params)
+      return response['data']['list']
+    with ThreadPoolExecutor(max_workers=self.parallelism) as executor:
+      results = list(executor.map(run_request, self.requests))
+    return [row for rows in results for row in rows]
+
+class TikTokReportPlanner:
+  api: TikTokAPI
+  requests_per_second: float
+  max_parallelism: int
+  max_page_size: int
+  max_rows_per_request: int
+  max_ids_per_request: int
+  seconds_per_page: float
+
+  def __init__(self, api: TikTokAPI, requests_per_second: Optional[float]=None, max_parallelism: int=4, max_page_size: int=1000, max_rows_per_request: int=10000, max_ids_per_request: int=100, seconds_per_page: float=1.0):
+    if requests_per_second is None:
+      requests_per_second = api.rate_budget.requests_per_second if api.rate_budget is not None else 5.0
+    self.api = api
+    self.requests_per_second = requests_per_second
+    self.max_parallelism = max_parallelism
+    self.max_page_size = max_page_size
+    self.max_rows_per_request = max_rows_per_request
+    self.max_ids_per_request = max_ids_per_request
+    self.seconds_per_page = seconds_per_page
+
+  def formatted_date(self, date: datetime) -> str:
+    return date.strftime('%Y-%m-%d')
+
+  def probe(self, endpoint: str, params: Dict[str, any]) -> int:
+    response = self.api.get(
+      endpoint=endpoint,
+      params={
+        **params,
+        'page': 1,
+        'page_size': 1,
+      },
+      paginate=False
+    )
+    page_info = response['page_info'] if 'page_info' in response else response['data'].get('page_info')
+    if page_info is None:
+      return len(response['data']['list']) if 'list' in response['data'] else 1
+    return page_info['total_number']
+
+  def date_shards(self, start: datetime, end: datetime, shard_count: int) -> List[tuple]:
+    days = (end - start).days + 1
+    shard_count = max(1, min(shard_count, days))
+    shards = []
+    for index in range(shard_count):
+      shard_start = start + timedelta(days=index * days // shard_count)
+      shard_end = start + timedelta(days=(index + 1) * days // shard_count - 1)
+      shards.append((shard_start, shard_end))
+    return shards
+
+  def plan(self, endpoint: str, params: Dict[str, any], start: datetime, end: datetime, entity_granularity: str, entity_ids: Optional[List[str]]=None, report_arguments: Optional[Dict[str, any]]=None) -> ReportPlan:
+    if end < start:
+      raise TikTokUsageError(f'TikTok Usage Error: The report end {self.formatted_date(end)} is before its start {self.formatted_date(start)}.')
+    ids_filter = f'{entity_granularity}_ids'
+    if entity_ids is None:
+      id_batches = [None]
+    else:
+      id_batches = [entity_ids[i:i + self.max_ids_per_request] for i in range(0, len(entity_ids), self.max_ids_per_request)]
+
+    requests = []
+    for id_batch in id_batches:
+      batch_params = {
+        **params,
+        'filtering': {
+          **params.get('filtering', {}),
+          **({ids_filter: id_batch} if id_batch is not None else {}),
+        },
+      }
+      total_rows = self.probe(
+        endpoint=endpoint,
+        params={
+          **batch_params,
+          'start_date': self.formatted_date(start),
+          'end_date': self.formatted_date(end),
+        }
+      )
+      shards = self.date_shards(
+        start=start,
+        end=end,
+        shard_count=math.ceil(total_rows / self.max_rows_per_request)
+      )
+      shard_days = (end - start).days + 1
+      for shard_start, shard_end in shards:
+        shard_rows = math.ceil(total_rows * ((shard_end - shard_start).days + 1) / shard_days)
+        requests.append(PlannedRequest(
+          endpoint=endpoint,
+          params={
+            **batch_params,
+            'start_date': self.formatted_date(shard_start),
+            'end_date': self.formatted_date(shard_end),
+            'page_size': self.max_page_size,
+          },
+          start=shard_start,
+          end=shard_end,
+          entity_ids=id_batch,
+          estimated_rows=shard_rows
+        ))
+
+    return ReportPlan(
+      requests=requests,
+      probe_count=len(id_batches),
+      parallelism=max(1, min(self.max_parallelism, len(requests), math.floor(self.requests_per_second * self.seconds_per_page) or 1)),
+      requests_per_second=self.requests_per_second,
+      seconds_per_page=self.seconds_per_page,
+      report_arguments=report_arguments
+    )
@@ -1,10 +1,14 @@
+import time
+import threading
 import pandas as pd
 
 from .api import TikTokAPI
-from .error import TikTokMissingAdvertiserError
-from .context import TimeGranularity, EntityGranularity
+from .error import TikTokMissingAdvertiserError, TikTokUsageError
+from .planning import TikTokReportPlanner, ReportPlan
+from .context import TimeGranularity, EntityGranularity, advertiser_info_fields, advertiser_info_dtypes
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional, Callable
+from typing import List, Dict, Optional, Callable, Tuple
 
 def require_advertiser_id(f: Callable[..., any]) -> Callable[..., any]:
   def wrapper(self, *args, **kwargs):
@@ -13,69 +17,241 @@ def require_advertiser_id(f: Callable[..., any]) -> Callable[..., any]:
     return f(self, *args, **kwargs)  
   return wrapper
 
+def parse_timestamps(values: pd.Series) -> pd.Series:
+  numeric_values = pd.to_numeric(values, errors='coerce')
+  if numeric_values.notna().sum() == values.notna().sum():
+    return pd.to_datetime(numeric_values, unit='s')
+  return pd.to_datetime(values)
+
+def compact_ids(ids: pd.Series) -> pd.Series:
+  ids = pd.to_numeric(ids, dtype_backend='numpy_nullable')
+  return ids.astype('Int64' if ids.isna().any() else 'int64')
+
+def compact_entity_ids(df: pd.DataFrame, entity_granularity: EntityGranularity):
+  for column in df.columns:
+    if entity_granularity.is_id_column(column):
+      df[column] = compact_ids(df[column])
+
+def format_entity_ids(df: pd.DataFrame, entity_granularity: EntityGranularity, string_ids: bool):
+  if not string_ids:
+    return
+  for column in df.columns:
+    if entity_granularity.is_id_column(column):
+      df[column] = df[column].astype('string')
+
 class TikTokReporter:
   api: TikTokAPI
+  advertiser_ttl: float
+  _advertiser_cache: Dict[Tuple[str, ...], Dict[str, Tuple[float, Dict[str, any]]]]
+  _advertiser_lock: threading.Lock
 
-  def __init__(self, api: TikTokAPI):
+  def __init__(self, api: TikTokAPI, advertiser_ttl: float=3600.0):
     self.api = api
+    self.advertiser_ttl = advertiser_ttl
+    self._advertiser_cache = {}
+    self._advertiser_lock = threading.Lock()
   
   def formatted_date(self, date: datetime) -> str:
     return date.strftime('%Y-%m-%d')
   
+  def get_advertiser_report(self, advertiser_ids: Optional[List[any]]=None, fields: Optional[List[str]]=None, batch_size: int=100, max_workers: int=4) -> pd.DataFrame:
+    if advertiser_ids is None:
+      response = self.api.get_advertiser_list()
+      advertiser_ids = [a['advertiser_id'] for a in response['data']['list']]
+    advertiser_ids = [str(i) for i in advertiser_ids]
+    if fields is None:
+      fields = advertiser_info_fields
+    elif 'id' not in fields:
+      fields = ['id', *fields]
+    if not advertiser_ids:
+      return pd.DataFrame(columns=fields)
+
+    now = time.monotonic()
+    with self._advertiser_lock:
+      cache = self._advertiser_cache.setdefault(tuple(sorted(fields)), {})
+      missing_ids = [i for i in dict.fromkeys(advertiser_ids) if i not in cache or now - cache[i][0] > self.advertiser_ttl]
+
+    batches = [missing_ids[i:i + batch_size] for i in range(0, len(missing_ids), batch_size)]
+    if batches:
+      with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        results = list(executor.map(lambda b: self.api.get_advertiser_info(advertiser_ids=b, fields=fields), batches))
+      with self._advertiser_lock:
+        for advertiser in (a for result in results for a in result):
+          cache[str(advertiser['id'])] = (now, advertiser)
+        self.evict_expired_advertisers(now=now)
+
+    with self._advertiser_lock:
+      rows = [cache[i][1] for i in advertiser_ids if i in cache and now - cache[i][0] <= self.advertiser_ttl]
+    df = pd.DataFrame(rows, columns=fields)
+    for field, dtype in advertiser_info_dtypes.items():
+      if field not in df.columns:
+        continue
+      df[field] = parse_timestamps(df[field]) if dtype.startswith('datetime64') else df[field].astype(dtype)
+    return df
+
+  def evict_expired_advertisers(self, now: float):
+    for fields, cache in list(self._advertiser_cache.items()):
+      for advertiser_id in [i for i, (fetched_at, _) in cache.items() if now - fetched_at > self.advertiser_ttl]:
+        del cache[advertiser_id]
+      if not cache:
+        del self._advertiser_cache[fields]
+
+  def validate_entity_columns(self, entity_granularity: EntityGranularity, columns: Optional[List[str]]):
+    if columns is None:
+      return
+    unknown_columns = [c for c in columns if c not in entity_granularity.entity_columns]
+    if unknown_columns:
+      raise TikTokUsageError(f'TikTok Usage Error: Unknown {entity_granularity.value} columns {unknown_columns}')
+
   @require_advertiser_id
-  def get_entity_report(self, granularity: str, ids: Optional[List[str]]=None, columns: Optional[List[str]]=None, deleted_only: bool=False) -> pd.DataFrame:
+  def get_entity_report(self, granularity: str, ids: Optional[List[any]]=None, columns: Optional[List[str]]=None, deleted_only: bool=False, string_ids: bool=False) -> pd.DataFrame:
+    entity_granularity = EntityGranularity(granularity)
+    self.validate_entity_columns(entity_granularity=entity_granularity, columns=columns)
     if ids is not None and len(ids) == 0:
       return pd.DataFrame() if columns is None else pd.DataFrame(columns=columns)
 
-    entity_granularity = EntityGranularity(granularity)
+    fields = None
+    if columns is not None:
+      fields = list(map(entity_granularity.entity_to_api_column, columns))
+      if entity_granularity.api_id_field not in fields:
+        fields.append(entity_granularity.api_id_field)
     response = self.api.get_entities(
       granularity=entity_granularity.value,
       ids=None if ids is not None and len(ids) > 100 else ids,
-      deleted_only=deleted_only
+      deleted_only=deleted_only,
+      fields=fields
     )
     df = pd.DataFrame(response)
     if df.empty:
       return pd.DataFrame() if columns is None else pd.DataFrame(columns=columns)
       
+    df = df.add_prefix(entity_granularity.prefix)
+    compact_entity_ids(df=df, entity_granularity=entity_granularity)
     if ids is not None and len(ids) > 100:
-      id_column = f'{entity_granularity.prefix}id'
-      df.drop(df.index[~df[id_column].isin(ids)], inplace=True)
+      id_column = entity_granularity.id_column
+      df.drop(df.index[~df[id_column].isin(compact_ids(pd.Series(ids)))], inplace=True)
       df.reset_index(drop=True, inplace=True)
-      
-    df = df.add_prefix(entity_granularity.prefix)
+
     if columns is not None:
       selected_columns = list(filter(lambda c: c in df.columns, columns))
       df = df[selected_columns]
 
+    format_entity_ids(df=df, entity_granularity=entity_granularity, string_ids=string_ids)
     return df
 
+  def performance_report_params(self, time_granularity: TimeGranularity, start: datetime, end: datetime, entity_granularity: EntityGranularity, entity_ids: Optional[List[str]], columns: List[str], deleted_only: bool) -> Dict[str, any]:
+    fields = list(filter(lambda c: c is not None, map(entity_granularity.performance_to_api_column, columns)))
+    return {
+      'advertiser_id': self.api.advertiser_id,
+      'start_date': self.formatted_date(start),
+      'end_date': self.formatted_date(end),
+      'time_granularity': time_granularity.api_value,
+      'fields': fields,
+      'page_size': 1000,
+      'group_by': ['STAT_GROUP_BY_FIELD_STAT_TIME', 'STAT_GROUP_BY_FIELD_ID'],
+      'filtering': {
+        **({f'{entity_granularity.value}_ids': entity_ids} if entity_ids is not None else {}),
+        **({'primary_status': 'STATUS_DELETE'} if deleted_only else {}),
+      }
+    }
+
+  def performance_report_arguments(self, time_granularity: TimeGranularity, start: datetime, end: datetime, entity_granularity: EntityGranularity, entity_ids: Optional[List[any]], columns: List[str], deleted_only: bool) -> Dict[str, any]:
+    return {
+      'advertiser_id': self.api.advertiser_id,
+      'time_granularity': time_granularity.value,
+      'start': start,
+      'end': end,
+      'entity_granularity': entity_granularity.value,
+      'entity_ids': [str(i) for i in entity_ids] if entity_ids is not None else None,
+      'columns': list(columns),
+      'deleted_only': deleted_only,
+    }
+
   @require_advertiser_id
-  def get_performance_report(self, time_granularity: str, start: datetime, end: datetime, entity_granularity: str, entity_ids: Optional[List[str]]=None, columns: Optional[List[str]]=None, deleted_only: bool=False):
+  def plan_performance_report(self, time_granularity: str, start: datetime, end: datetime, entity_granularity: str, entity_ids: Optional[List[str]]=None, columns: Optional[List[str]]=None, deleted_only: bool=False, planner: Optional[TikTokReportPlanner]=None) -> ReportPlan:
     entity_granularity = EntityGranularity(entity_granularity)
     time_granularity = TimeGranularity(time_granularity)
     if columns is None:
       columns = entity_granularity.performance_columns
+    if planner is None:
+      planner = TikTokReportPlanner(api=self.api)
+    report_arguments = self.performance_report_arguments(
+      time_granularity=time_granularity,
+      start=start,
+      end=end,
+      entity_granularity=entity_granularity,
+      entity_ids=entity_ids,
+      columns=columns,
+      deleted_only=deleted_only
+    )
     if entity_ids is not None and len(entity_ids) == 0:
-      return pd.DataFrame(columns=columns)
-    
-    fields = list(filter(lambda c: c is not None, map(entity_granularity.performance_to_api_column, columns)))
-    response = self.api.get(
+      return ReportPlan(
+        requests=[],
+        probe_count=0,
+        parallelism=1,
+        requests_per_second=planner.requests_per_second,
+        seconds_per_page=planner.seconds_per_page,
+        report_arguments=report_arguments
+      )
+
+    params = self.performance_report_params(
+      time_granularity=time_granularity,
+      start=start,
+      end=end,
+      entity_granularity=entity_granularity,
+      entity_ids=None,
+      columns=columns,
+      deleted_only=deleted_only
+    )
+    return planner.plan(
       endpoint=f'2/reports/{entity_granularity.value}/get/',
-      params={
-        'advertiser_id': self.api.advertiser_id,
-        'start_date': self.formatted_date(start),
-        'end_date': self.formatted_date(end),
-        'time_granularity': time_granularity.api_value,
-        'fields': fields,
-        'page_size': 1000,
-        'group_by': ['STAT_GROUP_BY_FIELD_STAT_TIME', 'STAT_GROUP_BY_FIELD_ID'],
-        'filtering': {
-          **({f'{entity_granularity.value}_ids': entity_ids} if entity_ids is not None else {}),
-          **({'primary_status': 'STATUS_DELETE'} if deleted_only else {}),
-        }
-      }
+      params=params,
+      start=start,
+      end=end,
+      entity_granularity=entity_granularity.value,
+      entity_ids=entity_ids,
+      report_arguments=report_arguments
     )
-    df = pd.DataFrame(response['data']['list'])
+
+  @require_advertiser_id
+  def get_performance_report(self, time_granularity: str, start: datetime, end: datetime, entity_granularity: str, entity_ids: Optional[List[any]]=None, columns: Optional[List[str]]=None, deleted_only: bool=False, plan: Optional[ReportPlan]=None, string_ids: bool=False):
+    entity_granularity = EntityGranularity(entity_granularity)
+    time_granularity = TimeGranularity(time_granularity)
+    if columns is None:
+      columns = entity_granularity.performance_columns
+    if end < start:
+      raise TikTokUsageError(f'TikTok Usage Error: The report end {self.formatted_date(end)} is before its start {self.formatted_date(start)}.')
+    if entity_ids is not None and len(entity_ids) == 0:
+      return pd.DataFrame(columns=columns)
+    
+    if plan is not None:
+      report_arguments = self.performance_report_arguments(
+        time_granularity=time_granularity,
+        start=start,
+        end=end,
+        entity_granularity=entity_granularity,
+        entity_ids=entity_ids,
+        columns=columns,
+        deleted_only=deleted_only
+      )
+      if plan.report_arguments != report_arguments:
+        raise TikTokUsageError(f'TikTok Usage Error: The plan was made for {plan.report_arguments}, not {report_arguments}.')
+      rows = plan.execute(api=self.api)
+    else:
+      response = self.api.get(
+        endpoint=f'2/reports/{entity_granularity.value}/get/',
+        params=self.performance_report_params(
+          time_granularity=time_granularity,
+          start=start,
+          end=end,
+          entity_granularity=entity_granularity,
+          entity_ids=entity_ids,
+          columns=columns,
+          deleted_only=deleted_only
+        )
+      )
+      rows = response['data']['list']
+    df = pd.DataFrame(rows)
     field_map = {
       **{
         f: entity_granularity.api_to_performance_column(f)
@@ -86,19 +262,24 @@ class TikTokReporter:
     }
     df = df[list(field_map.keys())]
     df.rename(columns=field_map, inplace=True)
+    compact_entity_ids(df=df, entity_granularity=entity_granularity)
+    format_entity_ids(df=df, entity_granularity=entity_granularity, string_ids=string_ids)
 
     return df
   
-  def add_entity_info(self, report: pd.DataFrame, report_entity_granularity: str, added_entity_granularity: Optional[str]=None, columns: Optional[List[str]]=None, deleted_only: bool=False) -> pd.DataFrame:
+  def add_entity_info(self, report: pd.DataFrame, report_entity_granularity: str, added_entity_granularity: Optional[str]=None, columns: Optional[List[str]]=None, deleted_only: bool=False, string_ids: bool=False) -> pd.DataFrame:
     if report.empty:
       return pd.DataFrame(columns=columns + list(report.columns)) if columns is not None else report.copy()
 
     if added_entity_granularity is None:
       added_entity_granularity = report_entity_granularity
 
-    assert f'{report_entity_granularity}_{added_entity_granularity}_id' in report.columns
+    report_id_column = f'{report_entity_granularity}_{added_entity_granularity}_id'
+    assert report_id_column in report.columns
 
-    entity_ids = [str(i) for i in report[f'{report_entity_granularity}_{added_entity_granularity}_id'].unique()]
+    if not pd.api.types.is_integer_dtype(report[report_id_column]):
+      report = report.assign(**{report_id_column: compact_ids(report[report_id_column])})
+    entity_ids = list(report[report_id_column].dropna().unique())
     entity_report = self.get_entity_report(
       granularity=added_entity_granularity,
       ids=entity_ids,
@@ -107,14 +288,21 @@ class TikTokReporter:
     )
     overlapping_columns = set(entity_report.columns).intersection(set(report.columns)) - {f'{added_entity_granularity}_{added_entity_granularity}_id'}
     entity_report.drop(columns=overlapping_columns, inplace=True)
+    added_granularity = EntityGranularity(added_entity_granularity)
+    for column in entity_report.columns:
+      if added_granularity.is_id_column(column):
+        entity_report[column] = entity_report[column].astype('Int64')
 
     merged_report = report.merge(
       right=entity_report,
       how='left',
-      left_on=f'{report_entity_granularity}_{added_entity_granularity}_id',
+      left_on=report_id_column,
       right_on=f'{added_entity_granularity}_{added_entity_granularity}_id',
       suffixes=('', '')
     )
+    compact_entity_ids(df=merged_report, entity_granularity=added_granularity)
+    format_entity_ids(df=merged_report, entity_granularity=EntityGranularity(report_entity_granularity), string_ids=string_ids)
+    format_entity_ids(df=merged_report, entity_granularity=added_granularity, string_ids=string_ids)
     return merged_report
 
   def add_performance_metrics(self, entity_report: pd.DataFrame, entity_granularity: str, time_granularity: str, start: datetime, end: datetime, columns: Optional[List[str]]=None, deleted_only: bool=False):
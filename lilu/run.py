@@ -130,3 +130,24 @@ def access_token(lilu: Lilu, app_id: str, secret: str, refresh_token: str):
   response_json = response.json()['data']
   lilu.user.present_message(f'Your access token is:\n{response_json["access_token"]}\n(expires in {timedelta(seconds=response_json["expires_in"])})\nYour refresh token is:\n{response_json["refresh_token"]}\n(expires in {timedelta(seconds=response_json["refresh_token_expires_in"])})')
   return response_json
+
+@run.command()
+@click.option('-a', '--app-id', 'app_id', prompt=True)
+@click.option('-s', '--secret', 'secret', prompt=True, hide_input=True)
+@click.option('-t', '--access-token', 'access_token', prompt=True, hide_input=True)
+@click.option('-h', '--host', 'host', default='127.0.0.1')
+@click.option('-p', '--port', 'port', type=int, default=5000)
+@click.option('-r', '--requests-per-second', 'requests_per_second', type=float, default=5.0)
+@click.option('-e', '--entity-ttl', 'entity_ttl', type=float, default=600.0)
+@click.pass_obj
+def serve(lilu: Lilu, app_id: str, secret: str, access_token: str, host: str, port: int, requests_per_second: float, entity_ttl: float):
+  from .service import TikTokReportService, create_app
+  service = TikTokReportService(
+    access_token=access_token,
+    client_secret=secret,
+    app_id=app_id,
+    requests_per_second=requests_per_second,
+    entity_ttl=entity_ttl
+  )
+  lilu.user.present_message(f'Serving TikTok reports for app {app_id} on http://{host}:{port}')
+  create_app(service=service).run(host=host, port=port, threaded=True)
@@ -0,0 +1,424 @@
+import io
+import importlib.util
+import time
+import requests
+import threading
+import pandas as pd
+
+from .api import TikTokAPI, RateBudget
+from .reporting import TikTokReporter, compact_ids, format_entity_ids
+from .context import TimeGranularity, EntityGranularity
+from .error import TikTokAPIError, TikTokUsageError
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from flask import Flask, Response, request, jsonify, abort, make_response
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Callable, Tuple, Iterator, FrozenSet
+
+class InFlightRequests:
+  _lock: threading.Lock
+  _futures: Dict[Tuple, Future]
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._futures = {}
+
+  def run(self, key: Tuple, f: Callable[[], any]) -> any:
+    with self._lock:
+      future = self._futures.get(key)
+      is_owner = future is None
+      if is_owner:
+        future = Future()
+        self._futures[key] = future
+    if not is_owner:
+      return future.result()
+    try:
+      result = f()
+      future.set_result(result)
+      return result
+    except Exception as e:
+      future.set_exception(e)
+      raise
+    finally:
+      with self._lock:
+        del self._futures[key]
+
+class CachedEntities:
+  fetched_at: float
+  columns: Optional[FrozenSet[str]]
+  report: pd.DataFrame
+
+  def __init__(self, fetched_at: float, columns: Optional[FrozenSet[str]], report: pd.DataFrame):
+    self.fetched_at = fetched_at
+    self.columns = columns
+    self.report = report
+
+  def covers(self, columns: Optional[List[str]]) -> bool:
+    if self.columns is None:
+      return True
+    return columns is not None and self.columns.issuperset(columns)
+
+class CachedTikTokReporter(TikTokReporter):
+  entity_ttl: float
+  in_flight: InFlightRequests
+  _entity_cache: Dict[Tuple[str, bool], CachedEntities]
+  _lock: threading.Lock
+
+  def __init__(self, api: TikTokAPI, entity_ttl: float):
+    super().__init__(api=api)
+    self.entity_ttl = entity_ttl
+    self.in_flight = InFlightRequests()
+    self._entity_cache = {}
+    self._lock = threading.Lock()
+
+  def fresh_cached_entities(self, key: Tuple[str, bool]) -> Optional[CachedEntities]:
+    with self._lock:
+      cached = self._entity_cache.get(key)
+    if cached is None or time.monotonic() - cached.fetched_at > self.entity_ttl:
+      return None
+    return cached
+
+  def fill_entity_cache(self, key: Tuple[str, bool], columns: Optional[List[str]]) -> CachedEntities:
+    granularity, deleted_only = key
+    cached = self.fresh_cached_entities(key=key)
+    if cached is not None and cached.covers(columns):
+      return cached
+    if columns is not None:
+      columns = sorted({
+        *columns,
+        *(cached.columns if cached is not None else []),
+        EntityGranularity(granularity).id_column,
+      })
+    fetched = CachedEntities(
+      fetched_at=time.monotonic(),
+      columns=frozenset(columns) if columns is not None else None,
+      report=super().get_entity_report(granularity=granularity, columns=columns, deleted_only=deleted_only)
+    )
+    with self._lock:
+      self._entity_cache[key] = fetched
+      self.evict_expired_entities(now=fetched.fetched_at)
+    return fetched
+
+  def evict_expired_entities(self, now: float):
+    for key in [k for k, cached in self._entity_cache.items() if now - cached.fetched_at > self.entity_ttl]:
+      del self._entity_cache[key]
+
+  def get_entity_report(self, granularity: str, ids: Optional[List[any]]=None, columns: Optional[List[str]]=None, deleted_only: bool=False, string_ids: bool=False) -> pd.DataFrame:
+    entity_granularity = EntityGranularity(granularity)
+    self.validate_entity_columns(entity_granularity=entity_granularity, columns=columns)
+    key = (entity_granularity.value, deleted_only)
+    cached = self.fresh_cached_entities(key=key)
+    while cached is None or not cached.covers(columns):
+      cached = self.in_flight.run(key=key, f=lambda: self.fill_entity_cache(key=key, columns=columns))
+    df = cached.report
+    if ids is not None and len(ids) == 0 or df.empty:
+      return pd.DataFrame() if columns is None else pd.DataFrame(columns=columns)
+    if ids is not None:
+      df = df[df[entity_granularity.id_column].isin(compact_ids(pd.Series(ids)))].reset_index(drop=True)
+    if columns is not None:
+      df = df[[c for c in columns if c in df.columns]]
+    df = df.copy()
+    format_entity_ids(df=df, entity_granularity=entity_granularity, string_ids=string_ids)
+    return df
+
+class TikTokReportService:
+  access_token: str
+  client_secret: str
+  app_id: str
+  entity_ttl: float
+  session: requests.Session
+  rate_budget: RateBudget
+  in_flight: InFlightRequests
+  discovery_reporter: TikTokReporter
+  reporter_ttl: float
+  max_reporters: int
+  max_unplanned_days: int
+  max_unplanned_ids: int
+  _reporters: OrderedDict[str, CachedTikTokReporter]
+  _reporter_used_at: Dict[str, float]
+  _lock: threading.Lock
+
+  def __init__(self, access_token: str, client_secret: str, app_id: str, requests_per_second: float=5.0, entity_ttl: float=600.0, reporter_ttl: float=3600.0, max_reporters: int=256, max_unplanned_days: int=7, max_unplanned_ids: int=100, pool_size: int=32):
+    self.access_token = access_token
+    self.client_secret = client_secret
+    self.app_id = app_id
+    self.entity_ttl = entity_ttl
+    self.reporter_ttl = reporter_ttl
+    self.max_reporters = max_reporters
+    self.max_unplanned_days = max_unplanned_days
+    self.max_unplanned_ids = max_unplanned_ids
+    self.session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    self.session.mount('https://', adapter)
+    self.rate_budget = RateBudget(requests_per_second=requests_per_second)
+    self.in_flight = InFlightRequests()
+    self._reporters = OrderedDict()
+    self._reporter_used_at = {}
+    self._lock = threading.Lock()
+    self.discovery_reporter = TikTokReporter(
+      api=TikTokAPI(
+        access_token=access_token,
+        client_secret=client_secret,
+        app_id=app_id,
+        session=self.session,
+        rate_budget=self.rate_budget
+      ),
+      advertiser_ttl=entity_ttl
+    )
+
+  def reporter(self, advertiser_id: str) -> CachedTikTokReporter:
+    now = time.monotonic()
+    with self._lock:
+      if advertiser_id in self._reporters:
+        self._reporters.move_to_end(advertiser_id)
+      else:
+        api = TikTokAPI(
+          access_token=self.access_token,
+          client_secret=self.client_secret,
+          app_id=self.app_id,
+          advertiser_id=advertiser_id,
+          session=self.session,
+          rate_budget=self.rate_budget
+        )
+        self._reporters[advertiser_id] = CachedTikTokReporter(api=api, entity_ttl=self.entity_ttl)
+      self._reporter_used_at[advertiser_id] = now
+      self.evict_idle_reporters(now=now)
+      return self._reporters[advertiser_id]
+
+  def evict_idle_reporters(self, now: float):
+    while self._reporters:
+      advertiser_id = next(iter(self._reporters))
+      if len(self._reporters) <= self.max_reporters and now - self._reporter_used_at[advertiser_id] <= self.reporter_ttl:
+        break
+      del self._reporters[advertiser_id]
+      del self._reporter_used_at[advertiser_id]
+
+  def get_entity_report(self, advertiser_id: str, granularity: str, ids: Optional[List[str]]=None, columns: Optional[List[str]]=None, deleted_only: bool=False) -> pd.DataFrame:
+    return self.in_flight.run(
+      key=('entity', advertiser_id, granularity, tuple(ids) if ids is not None else None, tuple(columns) if columns is not None else None, deleted_only),
+      f=lambda: self.reporter(advertiser_id).get_entity_report(
+        granularity=granularity,
+        ids=ids,
+        columns=columns,
+        deleted_only=deleted_only
+      )
+    )
+
+  def needs_plan(self, start: datetime, end: datetime, entity_ids: Optional[List[str]]) -> bool:
+    if entity_ids is not None and len(entity_ids) > self.max_unplanned_ids:
+      return True
+    return (end - start).days + 1 > self.max_unplanned_days
+
+  def get_performance_report(self, advertiser_id: str, time_granularity: str, start: datetime, end: datetime, entity_granularity: str, entity_ids: Optional[List[str]]=None, columns: Optional[List[str]]=None, deleted_only: bool=False, added_entity_granularity: Optional[str]=None, entity_columns: Optional[List[str]]=None) -> pd.DataFrame:
+    def run_report() -> pd.DataFrame:
+      reporter = self.reporter(advertiser_id)
+      plan = None
+      if self.needs_plan(start=start, end=end, entity_ids=entity_ids):
+        plan = reporter.plan_performance_report(
+          time_granularity=time_granularity,
+          start=start,
+          end=end,
+          entity_granularity=entity_granularity,
+          entity_ids=entity_ids,
+          columns=columns,
+          deleted_only=deleted_only
+        )
+      df = reporter.get_performance_report(
+        time_granularity=time_granularity,
+        start=start,
+        end=end,
+        entity_granularity=entity_granularity,
+        entity_ids=entity_ids,
+        columns=columns,
+        deleted_only=deleted_only,
+        plan=plan
+      )
+      if added_entity_granularity is not None:
+        added_id_column = EntityGranularity(added_entity_granularity).id_column
+        df = reporter.add_entity_info(
+          report=df,
+          report_entity_granularity=entity_granularity,
+          added_entity_granularity=added_entity_granularity,
+          columns=[added_id_column, *(c for c in entity_columns if c != added_id_column)] if entity_columns is not None else None,
+          deleted_only=deleted_only
+        )
+      return df
+    return self.in_flight.run(
+      key=(
+        'performance',
+        advertiser_id,
+        time_granularity,
+        start,
+        end,
+        entity_granularity,
+        tuple(entity_ids) if entity_ids is not None else None,
+        tuple(columns) if columns is not None else None,
+        deleted_only,
+        added_entity_granularity,
+        tuple(entity_columns) if entity_columns is not None else None,
+      ),
+      f=run_report
+    )
+
+def stream_csv(df: pd.DataFrame, chunk_size: int=10000) -> Iterator[str]:
+  if df.empty:
+    yield df.to_csv(index=False)
+    return
+  for start in range(0, len(df), chunk_size):
+    yield df.iloc[start:start + chunk_size].to_csv(index=False, header=start == 0)
+
+def stream_arrow(df: pd.DataFrame, chunk_size: int=10000) -> Iterator[bytes]:
+  import pyarrow as pa
+  table = pa.Table.from_pandas(df, preserve_index=False)
+  sink = io.BytesIO()
+  with pa.ipc.new_stream(sink, table.schema) as writer:
+    for batch in table.to_batches(max_chunksize=chunk_size):
+      writer.write_batch(batch)
+      yield sink.getvalue()
+      sink.seek(0)
+      sink.truncate()
+  yield sink.getvalue()
+
+def list_argument(name: str) -> Optional[List[str]]:
+  value = request.args.get(name)
+  return value.split(',') if value else None
+
+def advertiser_id_argument(advertiser_id: str) -> str:
+  if not advertiser_id.isdigit():
+    raise TikTokUsageError(f'TikTok Usage Error: The advertiser id must be numeric, not {advertiser_id}.')
+  return advertiser_id
+
+def id_list_argument(name: str) -> Optional[List[str]]:
+  ids = list_argument(name)
+  if ids is not None:
+    invalid_ids = [i for i in ids if not i.isdigit()]
+    if invalid_ids:
+      raise TikTokUsageError(f'TikTok Usage Error: The {name} argument must contain numeric ids, not {invalid_ids}.')
+  return ids
+
+def columns_argument(name: str, allowed_columns: List[str]) -> Optional[List[str]]:
+  columns = list_argument(name)
+  if columns is not None:
+    unknown_columns = [c for c in columns if c not in allowed_columns]
+    if unknown_columns:
+      raise TikTokUsageError(f'TikTok Usage Error: Unknown {name} {unknown_columns}.')
+  return columns
+
+def date_argument(name: str) -> datetime:
+  value = request.args.get(name)
+  if value is None:
+    raise TikTokUsageError(f'TikTok Usage Error: The {name} argument is required.')
+  try:
+    return datetime.strptime(value, '%Y-%m-%d')
+  except ValueError:
+    raise TikTokUsageError(f'TikTok Usage Error: The {name} argument must be a YYYY-MM-DD date, not {value}.')
+
+def granularity_argument(granularity_type: type, value: Optional[str]) -> Optional[str]:
+  if value is None:
+    return None
+  try:
+    return granularity_type(value).value
+  except ValueError:
+    raise TikTokUsageError(f'TikTok Usage Error: Unsupported granularity {value}.')
+
+def format_argument() -> str:
+  output_format = request.args.get('format', 'csv')
+  if output_format not in ['csv', 'arrow']:
+    raise TikTokUsageError(f'TikTok Usage Error: Unsupported format {output_format}.')
+  if output_format == 'arrow' and importlib.util.find_spec('pyarrow') is None:
+    abort(make_response(jsonify({'error': 'Arrow output requires pyarrow to be installed.'}), 501))
+  return output_format
+
+def report_response(df: pd.DataFrame, output_format: str) -> Response:
+  if output_format == 'arrow':
+    return Response(stream_arrow(df), mimetype='application/vnd.apache.arrow.stream')
+  return Response(stream_csv(df), mimetype='text/csv')
+
+def create_app(service: TikTokReportService) -> Flask:
+  app = Flask(__name__)
+
+  @app.errorhandler(TikTokUsageError)
+  def handle_usage_error(error: TikTokUsageError):
+    return jsonify({'error': str(error)}), 400
+
+  @app.errorhandler(TikTokAPIError)
+  def handle_api_error(error: TikTokAPIError):
+    return jsonify({'error': str(error), 'response': error.response}), 502
+
+  @app.route('/advertisers')
+  def advertiser_report():
+    output_format = format_argument()
+    advertiser_ids = id_list_argument('ids')
+    fields = list_argument('fields')
+    df = service.in_flight.run(
+      key=('advertisers', tuple(advertiser_ids or ()), tuple(fields or ())),
+      f=lambda: service.discovery_reporter.get_advertiser_report(
+        advertiser_ids=advertiser_ids,
+        fields=fields
+      )
+    )
+    return report_response(df=df, output_format=output_format)
+
+  @app.route('/advertisers/<advertiser_id>/entities/<granularity>')
+  def entity_report(advertiser_id: str, granularity: str):
+    output_format = format_argument()
+    advertiser_id = advertiser_id_argument(advertiser_id)
+    granularity = granularity_argument(EntityGranularity, granularity)
+    df = service.get_entity_report(
+      advertiser_id=advertiser_id,
+      granularity=granularity,
+      ids=id_list_argument('ids'),
+      columns=columns_argument('columns', EntityGranularity(granularity).entity_columns),
+      deleted_only=request.args.get('deleted_only') == 'true'
+    )
+    return report_response(df=df, output_format=output_format)
+
+  @app.route('/advertisers/<advertiser_id>/performance/<entity_granularity>')
+  def performance_report(advertiser_id: str, entity_granularity: str):
+    output_format = format_argument()
+    advertiser_id = advertiser_id_argument(advertiser_id)
+    entity_granularity = granularity_argument(EntityGranularity, entity_granularity)
+    time_granularity = granularity_argument(TimeGranularity, request.args.get('time_granularity', 'daily'))
+    added_entity_granularity = granularity_argument(EntityGranularity, request.args.get('added_entity_granularity'))
+    start = date_argument('start')
+    end = date_argument('end')
+    entity_ids = id_list_argument('entity_ids')
+    performance_columns = EntityGranularity(entity_granularity).performance_columns
+    columns = columns_argument('columns', performance_columns)
+    entity_columns = None
+    if added_entity_granularity is not None:
+      added_granularity = EntityGranularity(added_entity_granularity)
+      report_id_column = f'{entity_granularity}_{added_granularity.value}_id'
+      if report_id_column not in (columns if columns is not None else performance_columns):
+        raise TikTokUsageError(f'TikTok Usage Error: Adding {added_granularity.value} info requires the {report_id_column} column.')
+      entity_columns = columns_argument('entity_columns', added_granularity.entity_columns)
+    elif list_argument('entity_columns') is not None:
+      raise TikTokUsageError('TikTok Usage Error: The entity_columns argument requires added_entity_granularity.')
+    deleted_only = request.args.get('deleted_only') == 'true'
+    if request.args.get('explain') == 'true':
+      plan = service.reporter(advertiser_id).plan_performance_report(
+        time_granularity=time_granularity,
+        start=start,
+        end=end,
+        entity_granularity=entity_granularity,
+        entity_ids=entity_ids,
+        columns=columns,
+        deleted_only=deleted_only
+      )
+      return Response(plan.explain(), mimetype='text/plain')
+    df = service.get_performance_report(
+      advertiser_id=advertiser_id,
+      time_granularity=time_granularity,
+      start=start,
+      end=end,
+      entity_granularity=entity_granularity,
+      entity_ids=entity_ids,
+      columns=columns,
+      deleted_only=deleted_only,
+      added_entity_granularity=added_entity_granularity,
+      entity_columns=entity_columns
+    )
+    return report_response(df=df, output_format=output_format)
+
+  return app
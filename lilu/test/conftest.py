@@ -0,0 +1,46 @@
+import pytest
+
+from ..api import TikTokAPI
+from ..reporting import TikTokReporter
+from typing import Dict, List, Callable
+
+@pytest.fixture
+def api():
+  credentials = {
+    'access_token': 'ACCESS_TOKEN',
+    'client_secret': 'CLIENT_SECRET',
+    'app_id': 'APP_ID',
+    'advertiser_id': 'ADVERTISER_ID'
+  }
+  return TikTokAPI(**credentials)
+
+@pytest.fixture
+def reporter(api):
+  return TikTokReporter(api=api)
+
+class StubGet:
+  responses: Dict[str, Callable[[Dict[str, any]], Dict[str, any]]]
+  calls: List[Dict[str, any]]
+
+  def __init__(self):
+    self.responses = {}
+    self.calls = []
+
+  def respond(self, endpoint: str, response: Callable[[Dict[str, any]], Dict[str, any]]):
+    self.responses[endpoint] = response
+
+  def respond_with_list(self, endpoint: str, rows: List[Dict[str, any]]):
+    self.respond(endpoint, lambda params: {'code': 0, 'data': {'list': [dict(r) for r in rows]}})
+
+  def calls_to(self, endpoint: str) -> List[Dict[str, any]]:
+    return [c for c in self.calls if c['endpoint'] == endpoint]
+
+  def __call__(self, endpoint: str, params: Dict[str, any], paginate: bool=True) -> Dict[str, any]:
+    self.calls.append({'endpoint': endpoint, 'params': params, 'paginate': paginate})
+    return self.responses[endpoint](params)
+
+@pytest.fixture
+def stub_get(api, monkeypatch):
+  stub = StubGet()
+  monkeypatch.setattr(api, 'get', stub)
+  return stub
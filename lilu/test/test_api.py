@@ -1,22 +1,10 @@
 import pytest
+import pandas as pd
 
-from ..api import TikTokAPI
-from ..reporting import TikTokReporter
+from .. import reporting
+from ..error import TikTokUsageError
 from datetime import datetime
-
-@pytest.fixture
-def api():
-  credentials = {
-    'access_token': 'ACCESS_TOKEN',
-    'client_secret': 'CLIENT_SECRET',
-    'app_id': 'APP_ID',
-    'advertiser_id': 'ADVERTISER_ID'
-  }
-  return TikTokAPI(**credentials)
-
-@pytest.fixture
-def reporter(api):
-  return TikTokReporter(api=api)
+from types import SimpleNamespace
 
 def test_advertiser_list(api):
   response = api.get_advertiser_list()
@@ -68,3 +56,141 @@ def test_performance_reporting(reporter):
   )
   import pdb; pdb.set_trace()
   assert df is not None
+
+def test_entity_reporting_columns(reporter, stub_get):
+  stub_get.respond_with_list('2/adgroup/get/', [
+    {'adgroup_id': '1', 'adgroup_name': 'one', 'status': 'ENABLE'},
+  ])
+  df = reporter.get_entity_report(
+    granularity='adgroup',
+    columns=['adgroup_adgroup_name', 'adgroup_status']
+  )
+  assert stub_get.calls_to('2/adgroup/get/')[0]['params']['fields'] == ['adgroup_name', 'status', 'adgroup_id']
+  assert list(df.columns) == ['adgroup_adgroup_name', 'adgroup_status']
+  assert df['adgroup_adgroup_name'].tolist() == ['one']
+
+def test_entity_reporting_unknown_columns(reporter, stub_get):
+  with pytest.raises(TikTokUsageError):
+    reporter.get_entity_report(granularity='ad', columns=['ad_nonsense'])
+  with pytest.raises(TikTokUsageError):
+    reporter.get_entity_report(granularity='ad', columns=['ad_ad_name', 'ad_nonsense'])
+  assert stub_get.calls == []
+
+def test_get_entities_unknown_fields(api, stub_get):
+  with pytest.raises(TikTokUsageError):
+    api.get_entities(granularity='adgroup', fields=['adgroup_name', 'not_a_field'])
+  with pytest.raises(TikTokUsageError):
+    api.get_advertiser_info(fields=['name', 'not_a_field'])
+  assert stub_get.calls == []
+
+def respond_with_advertisers(stub_get, create_time: any=1588291200):
+  stub_get.respond_with_list('oauth2/advertiser/get/', [
+    {'advertiser_id': 1600000000000000000 + i, 'advertiser_name': f'advertiser {i}'}
+    for i in range(250)
+  ])
+  stub_get.respond('2/advertiser/info/', lambda params: {'code': 0, 'data': [
+    {'id': int(i), 'name': f'name {i}', 'balance': '1.5', 'create_time': create_time}
+    for i in params['advertiser_ids']
+  ]})
+
+def test_advertiser_report(reporter, stub_get, monkeypatch):
+  clock = SimpleNamespace(now=1000.0)
+  monkeypatch.setattr(reporting, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+  respond_with_advertisers(stub_get)
+  df = reporter.get_advertiser_report(fields=['name', 'balance', 'create_time'], batch_size=100)
+  info_calls = stub_get.calls_to('2/advertiser/info/')
+  assert sorted(len(c['params']['advertiser_ids']) for c in info_calls) == [50, 100, 100]
+  assert all(c['params']['fields'] == ['id', 'name', 'balance', 'create_time'] for c in info_calls)
+  assert list(df.columns) == ['id', 'name', 'balance', 'create_time']
+  assert df['id'].dtype == 'int64'
+  assert df['id'].iloc[249] == 1600000000000000249
+  assert df['balance'].dtype == 'float64'
+  assert df['create_time'].iloc[0] == datetime(2020, 5, 1)
+
+  reporter.get_advertiser_report(advertiser_ids=[1600000000000000000], fields=['create_time', 'balance', 'name'])
+  assert len(stub_get.calls_to('2/advertiser/info/')) == 3
+
+  clock.now += reporter.advertiser_ttl + 1
+  reporter.get_advertiser_report(advertiser_ids=[1600000000000000000], fields=['name'])
+  assert len(stub_get.calls_to('2/advertiser/info/')) == 4
+  assert list(reporter._advertiser_cache) == [('id', 'name')]
+  assert list(reporter._advertiser_cache[('id', 'name')]) == ['1600000000000000000']
+
+def test_advertiser_report_string_create_time(reporter, stub_get):
+  respond_with_advertisers(stub_get, create_time='2020-05-01 12:30:00')
+  df = reporter.get_advertiser_report(advertiser_ids=['1'], fields=['create_time'])
+  assert df['create_time'].iloc[0] == datetime(2020, 5, 1, 12, 30)
+
+def test_compact_ids_keeps_large_ids():
+  ids = reporting.compact_ids(pd.Series(['1666666666666666667', None]))
+  assert ids.dtype == 'Int64'
+  assert ids.iloc[0] == 1666666666666666667
+  assert ids.isna().tolist() == [False, True]
+  ids = reporting.compact_ids(pd.Series(['1666666666666666667', '2']))
+  assert ids.dtype == 'int64'
+  assert ids.tolist() == [1666666666666666667, 2]
+
+@pytest.fixture
+def adgroup_report(stub_get):
+  stub_get.respond_with_list('2/adgroup/get/', [
+    {'adgroup_id': '1666666666666666667', 'campaign_id': '1777777777777777777', 'adgroup_name': 'one'},
+    {'adgroup_id': '1666666666666666669', 'campaign_id': '1777777777777777779', 'adgroup_name': 'two'},
+  ])
+  return pd.DataFrame({
+    'adgroup_adgroup_id': [1666666666666666667, 1666666666666666669],
+    'adgroup_show_cnt': [10, 20],
+  })
+
+def test_entity_info_integer_ids(reporter, stub_get, adgroup_report):
+  df = reporter.add_entity_info(
+    report=adgroup_report,
+    report_entity_granularity='adgroup',
+    columns=['adgroup_adgroup_id', 'adgroup_campaign_id', 'adgroup_adgroup_name']
+  )
+  assert stub_get.calls_to('2/adgroup/get/')[0]['params']['filtering']['adgroup_ids'] == [1666666666666666667, 1666666666666666669]
+  assert df['adgroup_adgroup_id'].dtype == 'int64'
+  assert df['adgroup_campaign_id'].dtype == 'int64'
+  assert df['adgroup_campaign_id'].tolist() == [1777777777777777777, 1777777777777777779]
+  assert df['adgroup_adgroup_name'].tolist() == ['one', 'two']
+
+def test_entity_info_unmatched_ids(reporter, adgroup_report):
+  report = pd.DataFrame({
+    'adgroup_adgroup_id': ['1666666666666666667', '1666666666666666668'],
+    'adgroup_show_cnt': [10, 20],
+  })
+  df = reporter.add_entity_info(
+    report=report,
+    report_entity_granularity='adgroup',
+    columns=['adgroup_adgroup_id', 'adgroup_campaign_id']
+  )
+  assert df['adgroup_adgroup_id'].tolist() == [1666666666666666667, 1666666666666666668]
+  assert df['adgroup_campaign_id'].dtype == 'Int64'
+  assert df['adgroup_campaign_id'].iloc[0] == 1777777777777777777
+  assert df['adgroup_campaign_id'].isna().tolist() == [False, True]
+
+  df = reporter.add_entity_info(
+    report=report,
+    report_entity_granularity='adgroup',
+    columns=['adgroup_adgroup_id', 'adgroup_campaign_id'],
+    string_ids=True
+  )
+  assert df['adgroup_adgroup_id'].tolist() == ['1666666666666666667', '1666666666666666668']
+  assert df['adgroup_campaign_id'].iloc[0] == '1777777777777777777'
+  assert df['adgroup_campaign_id'].isna().tolist() == [False, True]
+
+def test_performance_report_integer_ids(reporter, stub_get):
+  stub_get.respond_with_list('2/reports/adgroup/get/', [
+    {'adgroup_id': '1666666666666666667', 'show_cnt': 3, 'stat_datetime': '2020-05-01 00:00:00'},
+  ])
+  arguments = {
+    'time_granularity': 'daily',
+    'start': datetime(2020, 5, 1),
+    'end': datetime(2020, 5, 1),
+    'entity_granularity': 'adgroup',
+    'columns': ['adgroup_adgroup_id', 'adgroup_show_cnt'],
+  }
+  df = reporter.get_performance_report(**arguments)
+  assert df['adgroup_adgroup_id'].dtype == 'int64'
+  assert df['adgroup_adgroup_id'].tolist() == [1666666666666666667]
+  df = reporter.get_performance_report(**arguments, string_ids=True)
+  assert df['adgroup_adgroup_id'].tolist() == ['1666666666666666667']
@@ -0,0 +1,142 @@
+import pytest
+
+from ..api import RateBudget
+from ..planning import TikTokReportPlanner
+from ..error import TikTokUsageError
+from datetime import datetime
+
+def date(value: str) -> datetime:
+  return datetime.strptime(value, '%Y-%m-%d')
+
+def respond_with_total(stub_get, endpoint: str, total_number: int, rows=[]):
+  def respond(params):
+    if params.get('page_size') == 1:
+      return {'code': 0, 'data': {'list': [], 'page_info': {'page': 1, 'total_page': total_number, 'total_number': total_number}}}
+    return {'code': 0, 'data': {'list': [dict(r) for r in rows]}}
+  stub_get.respond(endpoint, respond)
+
+def test_date_shards(api):
+  planner = TikTokReportPlanner(api=api)
+  assert planner.date_shards(start=date('2020-05-01'), end=date('2020-05-10'), shard_count=3) == [
+    (date('2020-05-01'), date('2020-05-03')),
+    (date('2020-05-04'), date('2020-05-06')),
+    (date('2020-05-07'), date('2020-05-10')),
+  ]
+  assert planner.date_shards(start=date('2020-05-01'), end=date('2020-05-02'), shard_count=5) == [
+    (date('2020-05-01'), date('2020-05-01')),
+    (date('2020-05-02'), date('2020-05-02')),
+  ]
+  assert planner.date_shards(start=date('2020-05-01'), end=date('2020-05-02'), shard_count=0) == [
+    (date('2020-05-01'), date('2020-05-02')),
+  ]
+
+def test_plan_batches_ids(api, stub_get):
+  respond_with_total(stub_get, 'ENDPOINT', total_number=10)
+  plan = TikTokReportPlanner(api=api).plan(
+    endpoint='ENDPOINT',
+    params={'filtering': {'primary_status': 'STATUS_DELETE'}},
+    start=date('2020-05-01'),
+    end=date('2020-05-02'),
+    entity_granularity='ad',
+    entity_ids=[str(i) for i in range(250)]
+  )
+  assert plan.probe_count == 3
+  assert all(not c['paginate'] and c['params']['page_size'] == 1 for c in stub_get.calls)
+  assert [len(r.params['filtering']['ad_ids']) for r in plan.requests] == [100, 100, 50]
+  assert all(r.params['filtering']['primary_status'] == 'STATUS_DELETE' for r in plan.requests)
+  assert plan.requests[2].entity_ids == [str(i) for i in range(200, 250)]
+
+def test_plan_page_estimates(api, stub_get):
+  respond_with_total(stub_get, 'ENDPOINT', total_number=25000)
+  plan = TikTokReportPlanner(api=api).plan(
+    endpoint='ENDPOINT',
+    params={},
+    start=date('2020-05-01'),
+    end=date('2020-05-10'),
+    entity_granularity='ad'
+  )
+  assert [(r.params['start_date'], r.params['end_date']) for r in plan.requests] == [
+    ('2020-05-01', '2020-05-03'),
+    ('2020-05-04', '2020-05-06'),
+    ('2020-05-07', '2020-05-10'),
+  ]
+  assert [r.estimated_rows for r in plan.requests] == [7500, 7500, 10000]
+  assert [r.page_size for r in plan.requests] == [1000, 1000, 1000]
+  assert plan.estimated_pages == 26
+  assert plan.parallelism == 3
+
+def test_plan_empty_probe_keeps_page_size(api, stub_get):
+  respond_with_total(stub_get, 'ENDPOINT', total_number=0)
+  plan = TikTokReportPlanner(api=api).plan(
+    endpoint='ENDPOINT',
+    params={},
+    start=date('2020-05-01'),
+    end=date('2020-05-01'),
+    entity_granularity='ad'
+  )
+  assert [r.page_size for r in plan.requests] == [1000]
+  assert plan.estimated_pages == 1
+
+def test_planner_uses_api_rate_budget(api):
+  assert TikTokReportPlanner(api=api).requests_per_second == 5.0
+  api.rate_budget = RateBudget(requests_per_second=2.0)
+  assert TikTokReportPlanner(api=api).requests_per_second == 2.0
+  assert TikTokReportPlanner(api=api, requests_per_second=3.0).requests_per_second == 3.0
+
+def test_explain(api, stub_get):
+  respond_with_total(stub_get, '2/reports/ad/get/', total_number=1500)
+  plan = TikTokReportPlanner(api=api).plan(
+    endpoint='2/reports/ad/get/',
+    params={},
+    start=date('2020-05-01'),
+    end=date('2020-05-03'),
+    entity_granularity='ad'
+  )
+  assert plan.explain() == '\n'.join([
+    '1 requests (1 probes already made), parallelism 1 at 5 requests/s',
+    'estimated 1500 rows in 2 pages, 0:00:02',
+    '  [0] 2/reports/ad/get/ 2020-05-01..2020-05-03 all ids: ~1500 rows, 2 pages of 1000',
+  ])
+
+def test_performance_report_plan(reporter, stub_get):
+  respond_with_total(stub_get, '2/reports/ad/get/', total_number=1, rows=[
+    {'ad_id': '1', 'show_cnt': 3, 'stat_datetime': '2020-05-01 00:00:00'},
+  ])
+  arguments = {
+    'time_granularity': 'daily',
+    'start': date('2020-05-01'),
+    'end': date('2020-05-03'),
+    'entity_granularity': 'ad',
+    'columns': ['ad_ad_id', 'ad_show_cnt'],
+  }
+  plan = reporter.plan_performance_report(**arguments)
+  df = reporter.get_performance_report(**arguments, plan=plan)
+  assert list(df.columns) == ['ad_ad_id', 'ad_show_cnt', 'ad_stat_datetime']
+  assert df['ad_show_cnt'].tolist() == [3]
+  assert len(stub_get.calls) == 2
+
+  with pytest.raises(TikTokUsageError):
+    reporter.get_performance_report(**{**arguments, 'end': date('2020-05-04')}, plan=plan)
+  with pytest.raises(TikTokUsageError):
+    reporter.get_performance_report(**{**arguments, 'columns': ['ad_ad_id']}, plan=plan)
+  assert len(stub_get.calls) == 2
+
+def test_plan_rejects_end_before_start(api, reporter, stub_get):
+  respond_with_total(stub_get, 'ENDPOINT', total_number=10)
+  for end in [date('2020-04-30'), date('2020-04-01')]:
+    with pytest.raises(TikTokUsageError):
+      TikTokReportPlanner(api=api).plan(
+        endpoint='ENDPOINT',
+        params={},
+        start=date('2020-05-01'),
+        end=end,
+        entity_granularity='ad'
+      )
+    with pytest.raises(TikTokUsageError):
+      reporter.plan_performance_report(
+        time_granularity='daily',
+        start=date('2020-05-01'),
+        end=end,
+        entity_granularity='ad'
+      )
+  assert stub_get.calls == []
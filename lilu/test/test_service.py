@@ -0,0 +1,254 @@
+import io
+import time
+import pytest
+import threading
+import pandas as pd
+
+from .. import service
+from ..service import InFlightRequests, CachedTikTokReporter, TikTokReportService, create_app, stream_csv, stream_arrow
+from .conftest import StubGet
+from types import SimpleNamespace
+
+class Clock:
+  now: float
+
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self) -> float:
+    return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+  clock = Clock()
+  monkeypatch.setattr(service, 'time', SimpleNamespace(monotonic=clock))
+  return clock
+
+@pytest.fixture
+def cached_reporter(api, stub_get):
+  stub_get.respond_with_list('2/adgroup/get/', [
+    {'adgroup_id': '1', 'adgroup_name': 'one', 'status': 'ENABLE', 'budget': 10},
+    {'adgroup_id': '2', 'adgroup_name': 'two', 'status': 'DISABLE', 'budget': 20},
+  ])
+  return CachedTikTokReporter(api=api, entity_ttl=60.0)
+
+@pytest.fixture
+def report_service():
+  return TikTokReportService(
+    access_token='ACCESS_TOKEN',
+    client_secret='CLIENT_SECRET',
+    app_id='APP_ID'
+  )
+
+@pytest.fixture
+def client(report_service):
+  return create_app(service=report_service).test_client()
+
+@pytest.fixture
+def service_stub_get(report_service, monkeypatch):
+  stub = StubGet()
+  stub.respond('2/reports/ad/get/', lambda params: {'code': 0, 'data': {
+    'list': [] if params['page_size'] == 1 else [{'ad_id': '7', 'show_cnt': 3, 'stat_datetime': '2020-05-01 00:00:00'}],
+    'page_info': {'page': 1, 'total_page': 1, 'total_number': 1},
+  }})
+  stub.respond_with_list('2/ad/get/', [{'ad_id': '7', 'ad_name': 'seven', 'campaign_id': '9'}])
+  monkeypatch.setattr(report_service.reporter('1').api, 'get', stub)
+  return stub
+
+def test_in_flight_waiter_shares_owner_result():
+  in_flight = InFlightRequests()
+  started = threading.Event()
+  release = threading.Event()
+  waiter_calls = []
+  results = {}
+
+  def owner():
+    started.set()
+    release.wait(timeout=5)
+    return 'owner result'
+
+  def run(name, f):
+    results[name] = in_flight.run(key=('key',), f=f)
+
+  owner_thread = threading.Thread(target=run, args=('owner', owner))
+  owner_thread.start()
+  started.wait(timeout=5)
+  waiter_thread = threading.Thread(target=run, args=('waiter', lambda: waiter_calls.append(1)))
+  waiter_thread.start()
+  time.sleep(0.1)
+  release.set()
+  owner_thread.join(timeout=5)
+  waiter_thread.join(timeout=5)
+
+  assert results == {'owner': 'owner result', 'waiter': 'owner result'}
+  assert waiter_calls == []
+  assert in_flight._futures == {}
+
+def test_in_flight_propagates_exceptions():
+  in_flight = InFlightRequests()
+  started = threading.Event()
+  release = threading.Event()
+  errors = {}
+
+  def owner():
+    started.set()
+    release.wait(timeout=5)
+    raise KeyError('failed')
+
+  def run(name, f):
+    try:
+      in_flight.run(key=('key',), f=f)
+    except KeyError as e:
+      errors[name] = e
+
+  owner_thread = threading.Thread(target=run, args=('owner', owner))
+  owner_thread.start()
+  started.wait(timeout=5)
+  waiter_thread = threading.Thread(target=run, args=('waiter', lambda: None))
+  waiter_thread.start()
+  time.sleep(0.1)
+  release.set()
+  owner_thread.join(timeout=5)
+  waiter_thread.join(timeout=5)
+
+  assert set(errors) == {'owner', 'waiter'}
+  assert errors['owner'] is errors['waiter']
+  assert in_flight._futures == {}
+  assert in_flight.run(key=('key',), f=lambda: 'retried') == 'retried'
+
+def test_in_flight_runs_sequential_requests_separately():
+  in_flight = InFlightRequests()
+  calls = []
+  assert in_flight.run(key=('key',), f=lambda: calls.append(1) or len(calls)) == 1
+  assert in_flight.run(key=('key',), f=lambda: calls.append(1) or len(calls)) == 2
+  assert in_flight._futures == {}
+
+def test_entity_cache_reuses_and_projects(cached_reporter, stub_get, clock):
+  first = cached_reporter.get_entity_report(granularity='adgroup', columns=['adgroup_adgroup_name'])
+  second = cached_reporter.get_entity_report(granularity='adgroup', ids=['2'], columns=['adgroup_adgroup_name'])
+  calls = stub_get.calls_to('2/adgroup/get/')
+  assert len(calls) == 1
+  assert calls[0]['params']['fields'] == ['adgroup_id', 'adgroup_name']
+  assert first['adgroup_adgroup_name'].tolist() == ['one', 'two']
+  assert second['adgroup_adgroup_name'].tolist() == ['two']
+
+  cached_reporter.get_entity_report(granularity='adgroup', columns=['adgroup_status'])
+  calls = stub_get.calls_to('2/adgroup/get/')
+  assert len(calls) == 2
+  assert calls[1]['params']['fields'] == ['adgroup_id', 'adgroup_name', 'status']
+
+  cached_reporter.get_entity_report(granularity='adgroup', columns=['adgroup_adgroup_name', 'adgroup_status'])
+  assert len(stub_get.calls_to('2/adgroup/get/')) == 2
+
+def test_entity_cache_expires(cached_reporter, stub_get, clock):
+  cached_reporter.get_entity_report(granularity='adgroup')
+  clock.now += 30
+  cached_reporter.get_entity_report(granularity='adgroup', columns=['adgroup_status'])
+  assert len(stub_get.calls_to('2/adgroup/get/')) == 1
+  assert 'fields' not in stub_get.calls[0]['params']
+  clock.now += 31
+  cached_reporter.get_entity_report(granularity='adgroup', columns=['adgroup_status'])
+  assert len(stub_get.calls_to('2/adgroup/get/')) == 2
+
+def test_entity_cache_separates_deleted_only(cached_reporter, stub_get, clock):
+  cached_reporter.get_entity_report(granularity='adgroup')
+  cached_reporter.get_entity_report(granularity='adgroup', deleted_only=True)
+  calls = stub_get.calls_to('2/adgroup/get/')
+  assert len(calls) == 2
+  assert calls[1]['params']['filtering'] == {'primary_status': 'STATUS_DELETE'}
+
+def test_stream_csv():
+  df = pd.DataFrame({'a': [1, 2, 3, 4, 5], 'b': list('vwxyz')})
+  chunks = list(stream_csv(df, chunk_size=2))
+  assert len(chunks) == 3
+  assert ''.join(chunks) == df.to_csv(index=False)
+  assert ''.join(stream_csv(pd.DataFrame(columns=['a', 'b']))) == 'a,b\n'
+
+def test_stream_arrow():
+  pa = pytest.importorskip('pyarrow')
+  df = pd.DataFrame({'a': [1, 2, 3, 4, 5], 'b': list('vwxyz')})
+  data = b''.join(stream_arrow(df, chunk_size=2))
+  table = pa.ipc.open_stream(io.BytesIO(data)).read_all()
+  assert table.num_rows == 5
+  assert table.column('a').to_pylist() == [1, 2, 3, 4, 5]
+  assert table.column('b').to_pylist() == list('vwxyz')
+
+def test_invalid_arguments(client):
+  assert client.get('/advertisers/1/entities/keyword').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-03&time_granularity=weekly').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-03&added_entity_granularity=keyword').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=May').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-02&end=2020-05-01').status_code == 400
+  assert client.get('/advertisers/1/entities/ad?format=xml').status_code == 400
+  assert client.get('/advertisers/1/entities/ad?ids=abc').status_code == 400
+  assert client.get('/advertisers/1/entities/ad?columns=ad_nonsense').status_code == 400
+  assert client.get('/advertisers/abc/entities/ad').status_code == 400
+  assert client.get('/advertisers?ids=1,abc').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-03&columns=foo').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-03&columns=foo&explain=true').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-03&entity_ids=7,x').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-03&added_entity_granularity=ad&entity_columns=foo').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-03&entity_columns=ad_ad_name').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-03&added_entity_granularity=campaign').status_code == 400
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-03&columns=ad_show_cnt&added_entity_granularity=ad').status_code == 400
+
+def test_performance_entity_columns_without_id(client, service_stub_get):
+  response = client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-01&columns=ad_ad_id,ad_show_cnt&added_entity_granularity=ad&entity_columns=ad_ad_name')
+  assert response.status_code == 200
+  assert response.get_data(as_text=True) == 'ad_ad_id,ad_show_cnt,ad_stat_datetime,ad_ad_name\n7,3,2020-05-01 00:00:00,seven\n'
+
+def test_arrow_without_pyarrow(client, monkeypatch):
+  find_spec = service.importlib.util.find_spec
+  monkeypatch.setattr(service.importlib.util, 'find_spec', lambda name: None if name == 'pyarrow' else find_spec(name))
+  response = client.get('/advertisers/1/entities/ad?format=arrow')
+  assert response.status_code == 501
+  assert 'pyarrow' in response.get_json()['error']
+
+def test_entity_cache_rejects_unknown_columns(cached_reporter, stub_get, clock):
+  cached_reporter.get_entity_report(granularity='adgroup')
+  with pytest.raises(service.TikTokUsageError):
+    cached_reporter.get_entity_report(granularity='adgroup', columns=['adgroup_nonsense'])
+  assert len(stub_get.calls) == 1
+
+def test_entity_cache_evicts_expired_entries(cached_reporter, stub_get, clock):
+  cached_reporter.get_entity_report(granularity='adgroup')
+  clock.now += 61
+  cached_reporter.get_entity_report(granularity='adgroup', deleted_only=True)
+  assert list(cached_reporter._entity_cache) == [('adgroup', True)]
+
+def test_service_evicts_idle_reporters(clock):
+  report_service = TikTokReportService(
+    access_token='ACCESS_TOKEN',
+    client_secret='CLIENT_SECRET',
+    app_id='APP_ID',
+    reporter_ttl=60.0,
+    max_reporters=2
+  )
+  first = report_service.reporter('1')
+  report_service.reporter('2')
+  assert report_service.reporter('1') is first
+  report_service.reporter('3')
+  assert list(report_service._reporters) == ['1', '3']
+
+  clock.now += 30
+  report_service.reporter('1')
+  clock.now += 31
+  report_service.reporter('4')
+  assert list(report_service._reporters) == ['1', '4']
+  assert set(report_service._reporter_used_at) == {'1', '4'}
+  assert report_service.reporter('1') is first
+
+def test_small_performance_reports_skip_planning(client, service_stub_get):
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-07').status_code == 200
+  calls = service_stub_get.calls_to('2/reports/ad/get/')
+  assert [c['params']['page_size'] for c in calls] == [1000]
+
+  ids = ','.join(str(i) for i in range(101))
+  assert client.get(f'/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-01&entity_ids={ids}').status_code == 200
+  calls = service_stub_get.calls_to('2/reports/ad/get/')[1:]
+  assert sorted(c['params']['page_size'] for c in calls) == [1, 1, 1000, 1000]
+
+  assert client.get('/advertisers/1/performance/ad?start=2020-05-01&end=2020-05-08').status_code == 200
+  calls = service_stub_get.calls_to('2/reports/ad/get/')[5:]
+  assert [c['params']['page_size'] for c in calls] == [1, 1000]